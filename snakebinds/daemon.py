@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+"""Lets many scripts share one set of listeners, by running a daemon that owns them and telling client
+scripts over a Unix domain socket when their macros are triggered.
+
+Start the daemon with "python -m snakebinds.daemon", then in each helper script use a Client in place
+of bind/ctl.
+
+The protocol is one line of plain text per message, space separated:
+    BIND <id> <macro_str>   ->  OK | ERR <reason>
+    UNBIND <id>             ->  OK
+    HELD <macro_str>        ->  OK 1 | OK 0 | ERR <reason>
+    KEYS                    ->  OK <key> <key> ...
+    RUNNING                 ->  OK 1 | OK 0
+    PRESS <key>             ->  OK      (injects a key event as if the user pressed it)
+    RELEASE <key>           ->  OK
+and the daemon sends "FIRE <id>" whenever a client's macro should run.
+"""
+from typing import Callable
+import os
+import socket
+import stat
+import tempfile
+import threading
+import queue
+from snakebinds import macro
+from functools import partial
+from snakebinds.macro import bind, unbind, ctl, process_macro_string, add_binding, remove_binding, start_loops
+
+
+def default_socket_path() -> str:
+    """The socket both the daemon and clients use unless told otherwise, one per user.
+
+    It lives in $XDG_RUNTIME_DIR, or failing that a directory in the temp directory that only this
+    user can use, so another user can't make the socket first and pretend to be the daemon.
+
+    Raises:
+        PermissionError: If the directory in the temp directory is someone else's, or others can
+            get into it.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "snakebinds.sock")
+
+    uid = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    directory = os.path.join(tempfile.gettempdir(), f"snakebinds-{uid}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+
+    check_owner(directory)
+    if hasattr(os, "getuid"):
+        mode = os.lstat(directory).st_mode
+        if not stat.S_ISDIR(mode) or stat.S_IMODE(mode) & 0o077:
+            raise PermissionError(f"{directory} isn't a directory only this user can use.")
+    return os.path.join(directory, "snakebinds.sock")
+
+
+def check_owner(path: str):
+    """Raises PermissionError if path (not what it links to) belongs to another user."""
+    if hasattr(os, "getuid") and os.lstat(path).st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user, refusing to use it.")
+
+
+def check_unix_sockets():
+    if not hasattr(socket, "AF_UNIX"):
+        raise NotImplementedError("The SnakeBinds daemon needs Unix domain sockets, which this system lacks.")
+
+
+class _Connection:
+    """One client connection on the daemon side, the lock stops FIRE lines and replies interleaving."""
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.bindings: dict[str, tuple[str]] = {}  # Client's binding id to its key combination.
+
+    def send(self, line: str):
+        with self.lock:
+            try:
+                self.sock.sendall(line.encode() + b"\n")
+            except OSError:
+                pass  # The client went away, its reader thread tidies up.
+
+
+class Daemon:
+    """Owns the socket, and translates client bindings into ordinary SnakeBinds bindings.
+
+    Several clients can bind the same key combination, so each combination gets a single bound
+    function that notifies everyone subscribed to it.
+    """
+    def __init__(self, path: str | None = None):
+        check_unix_sockets()
+        self.path = path or default_socket_path()
+        self._lock = threading.Lock()
+        self._subscribers: dict[tuple[str], set[tuple[_Connection, str]]] = {}
+
+        if os.path.lexists(self.path):
+            check_owner(self.path)
+            if daemon_is_running(self.path):
+                raise RuntimeError(f"A SnakeBinds daemon is already running on {self.path}.")
+            os.unlink(self.path)  # Left over from a daemon that didn't shut down cleanly.
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+
+    def start(self):
+        """Starts accepting clients in the background."""
+        self._accept_thread.start()
+
+    def close(self):
+        """Stops accepting clients and removes the socket file."""
+        self._server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return  # Server socket closed.
+            threading.Thread(target=self._client_loop, args=(_Connection(sock),), daemon=True).start()
+
+    def _client_loop(self, conn: _Connection):
+        try:
+            with conn.sock.makefile("r", encoding="utf-8") as lines:
+                for line in lines:
+                    conn.send(self._handle(conn, line.rstrip("\n")))
+        except OSError:
+            pass
+        finally:
+            # Connection closed (or this thread died), drop everything this client had bound.
+            for binding_id in list(conn.bindings):
+                self._unsubscribe(conn, binding_id)
+            conn.sock.close()
+
+    def _handle(self, conn: _Connection, line: str) -> str:
+        command, _, arg = line.partition(" ")
+        try:
+            if command == "BIND":
+                binding_id, _, macro_str = arg.partition(" ")
+                self._subscribe(conn, binding_id, process_macro_string(macro_str))
+                return "OK"
+            elif command == "UNBIND":
+                self._unsubscribe(conn, arg)
+                return "OK"
+            elif command == "HELD":
+                return "OK " + str(int(ctl.is_held(arg)))
+            elif command == "KEYS":
+                return " ".join(("OK",) + ctl.get_pressed_keys())
+            elif command == "RUNNING":
+                return "OK " + str(int(ctl.is_running()))
+            elif command == "PRESS":
+                inject(arg, True)
+                return "OK"
+            elif command == "RELEASE":
+                inject(arg, False)
+                return "OK"
+            else:
+                return f"ERR unknown command {command!r}"
+        except Exception as error:
+            # Anything a bad line causes goes back to the client rather than killing the connection.
+            return "ERR " + " ".join(str(error).split())
+
+    def _subscribe(self, conn: _Connection, binding_id: str, key_comb: tuple[str]):
+        with self._lock:
+            if binding_id in conn.bindings:
+                raise ValueError(f"binding id {binding_id} is already in use.")
+            conn.bindings[binding_id] = key_comb
+
+            if key_comb not in self._subscribers:
+                self._subscribers[key_comb] = set()
+                add_binding(key_comb, make_notifier(self, key_comb))
+            self._subscribers[key_comb].add((conn, binding_id))
+
+    def _unsubscribe(self, conn: _Connection, binding_id: str):
+        with self._lock:
+            key_comb = conn.bindings.pop(binding_id, None)
+            if key_comb is None:
+                return
+
+            self._subscribers[key_comb].discard((conn, binding_id))
+            if not self._subscribers[key_comb]:
+                # Nobody wants this combination any more, so stop matching it altogether.
+                del self._subscribers[key_comb]
+                remove_binding(key_comb)
+
+    def notify(self, key_comb: tuple[str]):
+        """Tells every client subscribed to key_comb to run its macro."""
+        for conn, binding_id in tuple(self._subscribers.get(key_comb, ())):
+            conn.send(f"FIRE {binding_id}")
+
+
+def daemon_is_running(path: str) -> bool:
+    """Whether something is answering on the socket at path."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        return False
+    else:
+        return True
+    finally:
+        probe.close()
+
+
+def make_notifier(daemon: Daemon, key_comb: tuple[str]) -> Callable:
+    """Makes the function bound in the daemon for a key combination."""
+    def notify():
+        daemon.notify(key_comb)
+    notify.__name__ = "+".join(key_comb)  # Shows up in stuck macro reports.
+    return notify
+
+
+def inject(key_str: str, pressed: bool):
+    """Feeds a key event into the matcher as though it came from the listeners.
+
+    Arguments:
+        key_str: A SnakeBinds key or alias (eg "ctrl", "a").
+        pressed: True for a press, False for a release.
+
+    Raises:
+        ValueError: If the key isn't valid.
+    """
+    key_comb = process_macro_string(key_str)
+    if len(key_comb) != 1 or key_comb[0][0] == "!":
+        raise ValueError(f"{key_str!r} is not a single key.")
+
+    if pressed:
+        macro._currently_held_keys.add(key_comb[0])
+        macro.try_hotkey(macro._currently_held_keys)
+    else:
+        macro._currently_held_keys.discard(key_comb[0])
+        macro.untry_hotkey(macro._currently_held_keys)
+
+
+def serve(path: str | None = None):
+    """Runs the daemon, starting the listeners and blocking until unbind() is called."""
+    daemon = Daemon(path)
+    daemon.start()
+    try:
+        bind()
+    finally:
+        daemon.close()
+
+
+class Client:
+    """Mirrors bind and ctl, but the listening and matching happens in the daemon.
+
+    Example:
+        client = Client()
+
+        @client.bind
+        def hello():
+            \"\"\"ctrl+h\"\"\"
+            print("hello")
+
+        client.bind()  # Blocks, running macros when the daemon says so, until client.unbind().
+
+    Macros run here exactly as they would with snakebinds.bind(), so ctl.print, ctl.queue, timeouts
+    and so on all work, but ctl.is_held etc. only know about this process, use the client's instead.
+    """
+    def __init__(self, path: str | None = None, timeout: float = 5.0):
+        """Arguments:
+            path: The daemon's socket, defaults to default_socket_path().
+            timeout: Seconds to wait for the daemon to answer a request.
+
+        Raises:
+            PermissionError: If the socket belongs to another user, who could run this client's
+                macros whenever they liked.
+        """
+        check_unix_sockets()
+        path = path or default_socket_path()
+        check_owner(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+
+        self.timeout = timeout
+        self._closed = False
+        self._funcs: dict[str, Callable] = {}
+        self._next_id = 0
+        self._replies: queue.Queue[str | None] = queue.Queue()
+        self._request_lock = threading.Lock()
+        self._loop_threads: tuple[threading.Thread] = ()  # The loops client.bind() started, if any.
+
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        with self._sock.makefile("r", encoding="utf-8") as lines:
+            try:
+                for line in lines:
+                    line = line.rstrip("\n")
+                    if line.startswith("FIRE "):
+                        self._fire(line[5:])
+                    else:
+                        self._replies.put(line)
+            except OSError:
+                pass
+
+        self._closed = True
+        self._replies.put(None)  # Wakes up anything waiting on a reply.
+        # Nothing more is coming, so let client.bind() return. Only if it's this client's loops that
+        # are running though, other clients or a local bind() could be sharing the process.
+        if self._loop_threads and self._loop_threads is macro._loop_threads and ctl.is_running():
+            unbind()
+
+    def _fire(self, binding_id: str):
+        func = self._funcs.get(binding_id)
+        if func is None or not ctl.is_running():
+            return  # Unbound since the daemon sent this, or this client isn't running macros.
+
+        # The usual event loop starts and supervises it, just as if a local listener triggered it.
+        macro._run_these_funcs.append(func)
+
+    def _request(self, line: str) -> str:
+        """Raises:
+            ValueError: If the daemon rejects the request.
+            ConnectionError: If the connection to the daemon has closed.
+            TimeoutError: If the daemon doesn't answer within self.timeout, the connection is closed
+                since a late answer would be mistaken for the answer to the next request.
+        """
+        with self._request_lock:
+            if self._closed:
+                raise ConnectionError("Not connected to the SnakeBinds daemon.")
+            self._sock.sendall(line.encode() + b"\n")
+            try:
+                reply = self._replies.get(timeout=self.timeout)
+            except queue.Empty:
+                self.unbind()
+                raise TimeoutError(f"The SnakeBinds daemon didn't answer {line!r}.") from None
+
+        if reply is None:
+            raise ConnectionError("The SnakeBinds daemon closed the connection.")
+        if reply.startswith("ERR"):
+            raise ValueError(reply[4:])
+        return reply[3:]
+
+    def bind(self, func=None, timeout: float | None = None):
+        """Same as snakebinds.bind, as a decorator it binds func through the daemon, called without
+        arguments it blocks running macros until unbind() is called or the daemon stops.
+
+        Arguments:
+            func: The function to bind, or None to start running macros.
+            timeout: Same as snakebinds.bind, use as @client.bind(timeout=5).
+
+        Raises:
+            ValueError: If the daemon rejects the macro string.
+        """
+        if func is None and timeout is not None:
+            return partial(self.bind, timeout=timeout)
+
+        if func is None:
+            # Runs the same macro and queued output loops as snakebinds.bind(), minus the listeners.
+            self._loop_threads = start_loops()
+            for loop_thread in self._loop_threads:
+                loop_thread.join()
+            return func
+
+        if not func.__doc__:
+            raise ValueError(f"Tried to bind {func.__name__} without macro definition.")
+
+        binding_id = str(self._next_id)
+        self._next_id += 1
+        # Whitespace is meaningless in macro strings and would break up the line.
+        self._request(f"BIND {binding_id} {''.join(func.__doc__.split())}")
+        self._funcs[binding_id] = func
+        if timeout is not None:
+            macro._macro_timeouts[func] = timeout
+
+        return func
+
+    def unbind_function(self, func: Callable):
+        """Removes every binding of func from the daemon."""
+        for binding_id, bound_func in list(self._funcs.items()):
+            if bound_func is func:
+                del self._funcs[binding_id]
+                self._request(f"UNBIND {binding_id}")
+        macro._macro_timeouts.pop(func, None)
+
+    def unbind(self):
+        """Disconnects from the daemon, which drops all of this client's bindings, and stops this
+        client's client.bind() once running macros have been cancelled."""
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Already disconnected.
+        self._sock.close()
+
+    def is_held(self, macro_str: str) -> bool:
+        """Same as ctl.is_held, using the daemon's view of the keyboard."""
+        return self._request(f"HELD {''.join(macro_str.split())}") == "1"
+
+    def get_pressed_keys(self) -> tuple[str]:
+        """Same as ctl.get_pressed_keys, using the daemon's view of the keyboard."""
+        return tuple(self._request("KEYS").split())
+
+    def is_running(self) -> bool:
+        """Same as ctl.is_running, for the daemon."""
+        return self._request("RUNNING") == "1"
+
+    def press(self, key_str: str):
+        """Tells the daemon a key was pressed, triggering any macros (in any script) it completes."""
+        self._request(f"PRESS {key_str}")
+
+    def release(self, key_str: str):
+        """Tells the daemon a key was released."""
+        self._request(f"RELEASE {key_str}")
+
+
+if __name__ == "__main__":
+    print(f"Starting SnakeBinds daemon on {default_socket_path()}.")
+    serve()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+"""Fast typing of whole strings, and abbreviations that expand into text as they are typed.
+
+pyautogui.write() goes through the queue one PAUSE delayed call at a time, instead strings are turned
+into pynput key events once (cached) and sent in a single queued call.
+"""
+from typing import Callable
+from functools import lru_cache
+import time
+from pynput import keyboard
+
+# Characters pynput can't type as plain KeyCodes.
+_special_chars = {
+    "\n": keyboard.Key.enter,
+    "\r": keyboard.Key.enter,
+    "\t": keyboard.Key.tab,
+    " ": keyboard.Key.space,
+    "\b": keyboard.Key.backspace,
+}
+
+_controller = None  # Made when first needed, so importing doesn't touch the display.
+
+
+@lru_cache(maxsize=256)
+def translate_text(text: str) -> tuple[keyboard.Key | keyboard.KeyCode]:
+    """Turns a string into the keys to tap to type it, pynput works out the layout and shift state.
+
+    Arguments:
+        text: The string to type.
+
+    Returns:
+        A tuple of pynput keys, one per character.
+    """
+    return tuple(_special_chars.get(char) or keyboard.KeyCode.from_char(char) for char in text)
+
+
+def send_keys(keys: tuple[keyboard.Key | keyboard.KeyCode], interval: float = 0):
+    """Taps each key in turn.
+
+    Arguments:
+        keys: The keys to tap, eg from translate_text.
+        interval: Seconds to wait after each key, 0 sends them as fast as possible.
+    """
+    global _controller
+    if _controller is None:
+        _controller = keyboard.Controller()
+
+    for key in keys:
+        _controller.press(key)
+        _controller.release(key)
+        if interval:
+            time.sleep(interval)
+
+
+class AbbreviationBuffer:
+    """Remembers the last few characters typed and spots when they end in an abbreviation.
+
+    Only as many characters as the longest abbreviation are kept, and each character typed costs one
+    dict lookup per distinct abbreviation length, however many abbreviations there are.
+    """
+    def __init__(self):
+        self._expansions: dict[str, str | Callable] = {}
+        self._lengths: tuple[int] = ()
+        self._buffer = ""
+
+    def __bool__(self) -> bool:
+        return bool(self._expansions)
+
+    def _update_lengths(self):
+        self._lengths = tuple(sorted({len(abbreviation) for abbreviation in self._expansions}, reverse=True))
+
+    def add(self, abbreviation: str, expansion: str | Callable):
+        """Adds an abbreviation, expanding to a string or running a function.
+
+        Raises:
+            ValueError: If the abbreviation is empty.
+            NameError: If the abbreviation is already in use.
+        """
+        if not abbreviation:
+            raise ValueError("Abbreviations need at least one character.")
+        if abbreviation in self._expansions:
+            raise NameError(f"{abbreviation!r} is already an abbreviation.")
+
+        self._expansions[abbreviation] = expansion
+        self._update_lengths()
+
+    def remove(self, abbreviation: str):
+        """Removes an abbreviation, does nothing if it doesn't exist."""
+        self._expansions.pop(abbreviation, None)
+        self._update_lengths()
+
+    def clear(self):
+        """Forgets what has been typed, eg after the cursor might have moved."""
+        self._buffer = ""
+
+    def feed(self, char: str) -> tuple[str, str | Callable] | None:
+        """Adds a typed character.
+
+        Returns:
+            The (abbreviation, expansion) just completed, longest first, or None.
+        """
+        if not self._lengths:
+            return None
+
+        self._buffer = (self._buffer + char)[-self._lengths[0]:]
+        for length in self._lengths:
+            abbreviation = self._buffer[-length:]
+            expansion = self._expansions.get(abbreviation)
+            if expansion is not None:
+                self._buffer = ""
+                return abbreviation, expansion
+
+        return None
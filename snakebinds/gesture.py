@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+"""Turns a stream of mouse movements into swipe gestures (gesture_up, gesture_left etc.).
+
+Movement events arrive hundreds of times a second, so they are decimated first: only one sample per
+interval is kept, later ones in the same interval just overwrite it. Samples go into a fixed size
+ring buffer, so memory and the work per sample stay the same however long the mouse moves for.
+"""
+from array import array
+from math import hypot
+
+
+class MotionBuffer:
+    """Fixed size ring buffer of (x, y) mouse positions, oldest samples get overwritten."""
+    def __init__(self, size: int):
+        if size < 2:
+            raise ValueError("A motion buffer needs at least 2 samples to have a direction.")
+
+        self._size = size
+        self._x = array("d", bytes(8 * size))  # Preallocated, pushing never allocates.
+        self._y = array("d", bytes(8 * size))
+        self._next = 0  # Index the next sample is written to.
+        self._count = 0
+        self._last_time: float | None = None  # When the last sample was kept, for decimation.
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        """Forgets all samples, eg when the held keys change and a new gesture could be starting."""
+        self._count = 0
+        self._last_time = None
+
+    def push(self, x: float, y: float, now: float, interval: float):
+        """Adds a mouse position, coalescing it into the latest sample if it arrived within
+        interval seconds of that sample being started.
+
+        Arguments:
+            x: The x position of the mouse.
+            y: The y position of the mouse.
+            now: The current time in seconds (eg time.monotonic()).
+            interval: Minimum time in seconds between kept samples.
+        """
+        if self._last_time is not None and now - self._last_time < interval:
+            # Coalesce: overwrite the newest sample rather than adding another.
+            newest = (self._next - 1) % self._size
+            self._x[newest] = x
+            self._y[newest] = y
+            return
+
+        self._last_time = now
+        self._x[self._next] = x
+        self._y[self._next] = y
+        self._next = (self._next + 1) % self._size
+        self._count = min(self._count + 1, self._size)
+
+    def ordered(self) -> tuple[array, array]:
+        """Returns the x and y samples oldest first."""
+        start = (self._next - self._count) % self._size
+        if start + self._count <= self._size:
+            return self._x[start:start + self._count], self._y[start:start + self._count]
+        return self._x[start:] + self._x[:self._next], self._y[start:] + self._y[:self._next]
+
+
+def detect_swipe(buffer: MotionBuffer, distance: float, straightness: float) -> str | None:
+    """Works out whether the samples in the buffer make a swipe.
+
+    Arguments:
+        buffer: The recent mouse positions.
+        distance: How far, in pixels, the mouse has to travel overall.
+        straightness: The overall distance divided by the length of the path taken has to be at
+            least this (1 is a perfectly straight line), so wiggling around doesn't count.
+
+    Returns:
+        "up", "down", "left" or "right", or None if it isn't a swipe.
+    """
+    if len(buffer) < 2:
+        return None
+
+    xs, ys = buffer.ordered()
+    dx = xs[-1] - xs[0]
+    dy = ys[-1] - ys[0]
+    net = hypot(dx, dy)
+    if net < distance:
+        return None
+
+    # Total length of the path, computed over the whole buffer in one go.
+    path = sum(map(hypot, map(float.__sub__, xs[1:], xs[:-1]), map(float.__sub__, ys[1:], ys[:-1])))
+    if net < straightness * path:
+        return None
+
+    if abs(dx) >= abs(dy):
+        return "right" if dx > 0 else "left"
+    return "down" if dy > 0 else "up"  # Screen y coordinates increase going down.
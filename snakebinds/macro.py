@@ -4,49 +4,79 @@ from __future__ import annotations
 from typing import Callable
 import threading
 import time
+import traceback
+from collections import deque
 from pynput import mouse, keyboard
 from functools import partial
+from itertools import combinations, count
 import pyautogui
 from snakebinds.snakebind_pynput import alias_to_snakebind, pynput_to_snakebind, os
+from snakebinds.gesture import MotionBuffer, detect_swipe
+from snakebinds.expansion import AbbreviationBuffer, translate_text, send_keys
+from snakebinds.scheduler import DeadlineScheduler
 
 
-def bind(func=None):
+def bind(func=None, timeout: float | None = None, policy: str | None = None):
     """Decorator for creating a new macro.
     Alternatively call in isolation to start running macros.
 
     Arguments:
         func: The function to run when the macro is triggered, leave blank to start off the
             background macro detection and running.
+        timeout: Optional wall-clock limit in seconds for each run of the macro, use as
+            @bind(timeout=5). Once exceeded, the run is cancelled (see ctl.is_cancelled).
+        policy: Optionally overrides ctl.MATCH_POLICY for this macro, eg
+            @bind(policy="most_specific") stops "shift+t" firing when "ctrl+shift+t" is pressed.
     Returns:
         func, unmodified.
+
+    Raises:
+        ValueError: If policy isn't one of MATCH_POLICIES.
     """
+    if func is None and (timeout is not None or policy is not None):
+        # Usage as @bind(timeout=...), which has to hand back the real decorator.
+        return partial(bind, timeout=timeout, policy=policy)
+
     # Doing this means you can call bind() as a normal function, *or* wrap a function as a decorator.
     if func is None:
         # Usage as a function to call to start running macros.
         _bind()
     
     else:
-        bind_this_function(func)
+        bind_this_function(func, timeout, policy)
     
     return func  # Don't otherwise modify the code around the functions.
 
 
 class MacroThread:
-    """Wraps a function, runs it as a thread, and says whether the macro has finished."""
-    def __init__(self, func: Callable, *args, **kwargs):
+    """Wraps a function, runs it as a thread, and says whether the macro has finished.
+
+    Each run carries its own cancellation token, which the ctl helpers check so that a macro can
+    be asked to wind down (Python threads can't be killed from outside, only asked nicely).
+    """
+    def __init__(self, func: Callable, *args, timeout: float | None = None, **kwargs):
         self._started = False
         self._finished = False
         self._killable = False
+        self._reported = False  # Whether this run has already been reported as stuck.
+        self._cancelled = threading.Event()
+
+        self.func = func
+        self.timeout = timeout
+        self.started_at: float | None = None
+        self.cancelled_at: float | None = None
 
-        def run_this():
+        def run_this(*args, **kwargs):
             nonlocal self
+            _current_macro.thread = self  # Lets ctl functions find the token of the calling macro.
             try:
-                func()
+                func(*args, **kwargs)
             finally:
                 # Make sure that even if func() errors, the thread can still be joined.
                 self._finished = True
         
-        self._thread = threading.Thread(target=run_this, args=args, kwargs=kwargs)
+        # Daemon threads, so a macro that ignores cancellation can't hold the interpreter open.
+        self._thread = threading.Thread(target=run_this, args=args, kwargs=kwargs, daemon=True)
 
     @property
     def started(self) -> bool:
@@ -60,14 +90,47 @@ class MacroThread:
     def killable(self) -> bool:
         return self._killable
 
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def name(self) -> str:
+        return getattr(self.func, "__name__", repr(self.func))
+
     def start(self):
         """Starts running the code in the macro. Errors if it has already started."""
         if self._started:
             raise RuntimeError("Macro thread has already started.")
         
         self._started = True
+        self.started_at = time.monotonic()
         self._thread.start()
 
+    def cancel(self):
+        """Asks the macro to stop at its next checkpoint (ctl.is_held, ctl.sleep, ctl.queue etc)."""
+        if not self._cancelled.is_set():
+            self.cancelled_at = time.monotonic()
+            self._cancelled.set()
+
+    def wait_cancelled(self, seconds: float) -> bool:
+        """Sleeps for up to the given number of seconds, waking early if cancelled.
+
+        Returns:
+            True if the macro was cancelled during (or before) the wait.
+        """
+        return self._cancelled.wait(seconds)
+
+    def timed_out(self, now: float) -> bool:
+        """Whether this run has exceeded its wall-clock timeout, if it has one."""
+        return self.timeout is not None and self.started_at is not None and \
+            now - self.started_at > self.timeout
+
+    def stuck(self, now: float) -> bool:
+        """Whether this run has ignored its cancellation for longer than ctl.MACRO_CANCEL_GRACE."""
+        return not self._finished and self.cancelled_at is not None and \
+            now - self.cancelled_at > ctl.MACRO_CANCEL_GRACE
+
     # The reason this is here is so that the thread can notify the outer program that it has
     # finished without twisting around trying to join itself from within the thread.
     def stop(self):
@@ -85,32 +148,121 @@ class MacroThread:
 
 _run = False
 _bound_keys: dict[tuple[str], Callable] = {}  # User defined macro combinations and their respective functions.
+_macro_timeouts: dict[Callable, float] = {}  # Per-function wall-clock limits, set by @bind(timeout=...).
+
+# Worked out once per combination at bind time, so matching a key event is just set operations.
+_combo_keys: dict[tuple[str], tuple[frozenset[str], frozenset[str]]] = {}  # Combination to (inclusions, exclusions).
+_supersets: dict[tuple[str], set[tuple[str]]] = {}  # Combinations needing strictly more keys than this one.
+_combos_by_key: dict[str, set[tuple[str]]] = {}  # Key to the combinations that need it held.
+_combos_by_inclusions: dict[frozenset[str], set[tuple[str]]] = {}  # The keys a combination needs held, to combinations.
+_bindings_lock = threading.Lock()  # Only one change to the bindings at a time, the listeners don't wait on it.
+_combo_policies: dict[tuple[str], str] = {}  # Combinations that override ctl.MATCH_POLICY.
+
+MATCH_POLICIES = ("all", "most_specific")
+
+# Written after the keys, eg "caps_lock:hold", stored as a last ":hold" item in the combination.
+TRIGGERS = ("press", "release", "tap", "hold", "double")
+# Only these are sure to fire once their combination is held, so only they override less specific
+# combinations. A "ctrl+shift+t:hold" that is let go quickly mustn't swallow "shift+t".
+OVERRIDING_TRIGGERS = ("press", "release")
+_combo_triggers: dict[tuple[str], str] = {}  # Combinations with a trigger other than press.
+_suppressed: set[tuple[str]] = set()  # Held combinations that "most_specific" stopped from triggering.
+_press_times: dict[tuple[str], float] = {}  # When timed combinations were last pressed.
+_press_generations: dict[tuple[str], int] = {}  # Numbers presses, so stale deadlines can tell they're stale.
+_press_counter = count(1)  # Shared, so a combination unbound and bound again can't reuse a number.
+_scheduler = DeadlineScheduler()  # Every hold/tap/double deadline, on one thread.
 _pressed_keys: dict[tuple[str], bool] = {}  # This prevents a macro running more than once at a time.
 
 _run_these_funcs: list[Callable] = []  # This stores scheduled macros to run.
 _currently_held_keys: set[str] = set()
+_gesture_bindings = 0  # How many bound combinations use gesture_ keys, mouse movement is ignored when 0.
+_motion = MotionBuffer(32)  # Recent mouse positions, for spotting gestures.
+_abbreviations = AbbreviationBuffer()  # Recently typed characters, for spotting abbreviations.
+# Keys ctl.type_text() has sent and the listener hasn't seen yet, oldest first, as (key, expiry
+# time). They arrive asynchronously, so they're matched up in order rather than by a flag.
+_synthetic_keys: deque[tuple[str, float]] = deque()
+SYNTHETIC_KEY_EXPIRY = 1.0  # Seconds to wait for a sent key to come back before giving up on it.
+_shortcut_modifiers = {"ctrl", "ctrl_r", "alt", "alt_r", "cmd", "cmd_r"}  # Held, these mean keys aren't typing.
 _macro_threads: list[MacroThread] = []  # These are the running macros.
-_queued_partials: list[Callable] = []  # Invidividual keys are pressed as per their position in this queue.
+_queued_partials: deque[Callable] = deque()  # Invidividual keys are pressed as per their position in this queue.
+_stuck_macros: list[MacroThread] = []  # Cancelled macros that never finished, kept so they can be reported.
+_current_macro = threading.local()  # Holds the MacroThread of whichever macro is running in this thread.
 
 _keyboard_listener = None
+_dispatcher_running = threading.Event()  # Set while the event loop is starting macros.
 _mouse_listener = None
+_loop_threads: tuple[threading.Thread] = ()  # The threads from the latest start_loops().
+_loops_stopping = threading.Event()  # Set to stop the latest start_loops() threads, each call gets a new one.
+# Held while starting or stopping the loops and listeners. Reentrant, so ctl.start() can hold it
+# across its "already running?" check and start_loops().
+_start_lock = threading.RLock()
 
 
 def false_if_exclamation(word: str) -> bool: return word[0] != "!"
+def is_trigger(word: str) -> bool: return len(word) > 1 and word[0] == ":"  # Just ":" is the colon key.
 def is_not_killable(macro_thread: MacroThread) -> bool: return not macro_thread.killable
-def stop_if_finished(macro_thread: MacroThread):
-    if macro_thread.finished:
-        macro_thread.stop()
+
+def get_current_macro() -> MacroThread | None:
+    """Returns the MacroThread running in the calling thread, or None outside of a macro."""
+    return getattr(_current_macro, "thread", None)
+
+
+def supervise_macros():
+    """Joins finished macros, cancels ones past their timeout and reports ones that are stuck."""
+    global _macro_threads
+
+    now = time.monotonic()
+    for macro_thread in _macro_threads:
+        if macro_thread.finished:
+            macro_thread.stop()  # Joins and makes killable all macro threads that have finished executing.
+
+        elif macro_thread.timed_out(now) and not macro_thread.cancelled:
+            print(f"WARNING: {macro_thread.name} ran past its {macro_thread.timeout}s timeout, cancelling.")
+            macro_thread.cancel()
+
+        elif macro_thread.stuck(now) and not macro_thread._reported:
+            macro_thread._reported = True
+            _stuck_macros.append(macro_thread)
+            print(f"WARNING: {macro_thread.name} is still running {ctl.MACRO_CANCEL_GRACE}s after being cancelled.")
+
+    _macro_threads = list(filter(is_not_killable, _macro_threads))  # Remove finished threads.
+
+
+def cancel_all_macros():
+    """Cancels every running macro, waits up to ctl.MACRO_CANCEL_GRACE for them to finish, and
+    reports any that leaked."""
+    global _macro_threads
+
+    for macro_thread in _macro_threads:
+        macro_thread.cancel()
+
+    deadline = time.monotonic() + ctl.MACRO_CANCEL_GRACE
+    for macro_thread in _macro_threads:
+        macro_thread._thread.join(max(0, deadline - time.monotonic()))
+
+    for macro_thread in _macro_threads:
+        if macro_thread.finished:
+            macro_thread.stop()
+        elif not macro_thread._reported:
+            macro_thread._reported = True
+            _stuck_macros.append(macro_thread)
+            print(f"WARNING: {macro_thread.name} leaked, it ignored cancellation during unbind().")
+
+    _macro_threads = list(filter(is_not_killable, _macro_threads))
 
 # These two functions separate required keys pressed from required !keys unpressed.
 def get_inclusions(key_names: tuple[str]) -> set[str]:
     """Returns all required keys pressed for this macro to trigger. Doesn't return !keys."""
-    return set(filter(false_if_exclamation, key_names))
+    return {key_name for key_name in key_names if false_if_exclamation(key_name) and not is_trigger(key_name)}
 
 def get_exclusions(key_names: tuple[str]) -> set[str]:
     """Returns all required unpressed !keys for this macro to trigger."""
     return {key_name[1:] for key_name in key_names if key_name[0] == "!"}
 
+def get_trigger(key_names: tuple[str]) -> str:
+    """Returns when this macro triggers, "press" unless the macro string ends in eg ":hold"."""
+    return key_names[-1][1:] if is_trigger(key_names[-1]) else "press"
+
 # Runs every time an event is received.
 def try_hotkey(currently_held_keys: list[str]):
     """Checks if the current combination of keys is a hotkey, and schedules it to run if so.
@@ -126,25 +278,31 @@ def try_hotkey(currently_held_keys: list[str]):
         print(f"Currently held keys: {currently_held_keys}")
 
     if _run:  # Don't try to add new macros when the program is idle.
-        for key_comb in _bound_keys:
-
-            # Make sure all keys in the combination are pressed.
-            if get_inclusions(key_comb) <= currently_held_keys:
-
-                # Make sure no !keys are pressed.
-                # (That pressed keys and the "!" exclusions are disjoint.)
-                if not get_exclusions(key_comb) & currently_held_keys:
-
-                    # Make sure this only occurs once per key combination.
-                    if not _pressed_keys[key_comb]:
-                        _run_these_funcs.append(_bound_keys[key_comb])
-                        _pressed_keys[key_comb] = True
-                else:
-                    _pressed_keys[key_comb] = False
-            
-            else:
+        satisfied = set()
+        for key_comb in tuple(_bound_keys):  # Bindings can change mid-event (see add_bindings).
+            if combo_is_held(key_comb, currently_held_keys):
+                satisfied.add(key_comb)
+            elif _pressed_keys.get(key_comb, False):
+                combo_let_go(key_comb)
                 # Update that it's not pressed *after* trying to trigger the functions.
-                _pressed_keys[key_comb] = False
+                set_pressed(key_comb, False)
+
+        for key_comb in satisfied:
+            # Make sure this only occurs once per key combination.
+            if _pressed_keys.get(key_comb, True):
+                continue  # Already pressed, or unbound since the snapshot.
+            set_pressed(key_comb, True)
+
+            # A more specific combination being held as well overrides this one, if it wants.
+            if _combo_policies.get(key_comb, ctl.MATCH_POLICY) == "most_specific" and \
+                    not _supersets.get(key_comb, set()).isdisjoint(satisfied):
+                _suppressed.add(key_comb)  # So letting go doesn't trigger it either (eg ":release").
+                continue
+
+            if key_comb in _combo_triggers:
+                combo_pressed(key_comb)
+            else:
+                fire_combo(key_comb)
 
 
 # This just exists so the program recognises when keys are unpressed, without having to trigger hotkeys again.
@@ -156,17 +314,151 @@ def untry_hotkey(currently_held_keys: list[str]):
     """
     global _pressed_keys
 
-    for key_comb in _pressed_keys:
-        if get_inclusions(key_comb) <= currently_held_keys:
-            if not get_exclusions(key_comb) & currently_held_keys:
-                    _pressed_keys[key_comb] = True
-            else:
-                _pressed_keys[key_comb] = False
+    for key_comb, was_held in tuple(_pressed_keys.items()):
+        is_held = combo_is_held(key_comb, currently_held_keys)
+        if not is_held and was_held:
+            combo_let_go(key_comb)
+        if is_held != was_held:
+            set_pressed(key_comb, is_held)
+
+
+def set_pressed(key_comb: tuple[str], pressed: bool):
+    """Updates _pressed_keys from a listener, without adding back a combination that has been
+    unbound since the listener took its snapshot."""
+    if key_comb in _pressed_keys:
+        _pressed_keys[key_comb] = pressed
+
+
+def combo_let_go(key_comb: tuple[str]):
+    """Called when a held combination stops being held."""
+    if key_comb in _suppressed:
+        _suppressed.discard(key_comb)  # It never triggered, so it doesn't get a release either.
+    elif key_comb in _combo_triggers:
+        combo_released(key_comb)
+
+
+# These handle combinations triggered by something other than being pressed, eg "caps_lock:hold".
+# Anything that has to wait goes on _scheduler, and _press_generations lets a deadline tell whether
+# the combination has been pressed again since it was scheduled.
+def combo_pressed(key_comb: tuple[str]):
+    """Called when a combination with a timed trigger becomes held."""
+    trigger = _combo_triggers[key_comb]
+    now = time.monotonic()
+    generation = _press_generations[key_comb] = next(_press_counter)
+
+    if trigger == "hold":
+        _scheduler.schedule(now + ctl.HOLD_TIME, partial(fire_if_current, key_comb, generation, True))
+
+    elif trigger == "double":
+        last_pressed = _press_times.pop(key_comb, None)
+        if last_pressed is not None and now - last_pressed <= ctl.DOUBLE_TAP_TIME:
+            fire_combo(key_comb)
+            return  # A third press starts afresh rather than being another double tap.
+
+    _press_times[key_comb] = now
+
+def combo_released(key_comb: tuple[str]):
+    """Called when a combination with a timed trigger stops being held."""
+    trigger = _combo_triggers[key_comb]
+
+    if trigger == "release":
+        fire_combo(key_comb)
+
+    elif trigger == "tap":
+        pressed_at = _press_times.pop(key_comb, None)
+        if pressed_at is None or time.monotonic() - pressed_at > ctl.HOLD_TIME:
+            return  # Held too long to be a tap.
+
+        double_comb = key_comb[:-1] + (":double",)
+        if double_comb in _bound_keys:
+            if double_comb not in _press_times:
+                return  # The double tap fired on this press, which used up its press time.
+
+            # Wait and see whether this is the first half of a double tap.
+            generation = _press_generations.get(key_comb)
+            _scheduler.schedule(pressed_at + ctl.DOUBLE_TAP_TIME,
+                                partial(fire_if_current, key_comb, generation, False))
         else:
-            _pressed_keys[key_comb] = False
+            fire_combo(key_comb)
+
+def fire_if_current(key_comb: tuple[str], generation: int, must_be_held: bool):
+    """Deadline callback, fires unless the combination was pressed again (or released, if it has
+    to still be held) since the deadline was set."""
+    if _press_generations.get(key_comb) != generation:
+        return
+    if must_be_held and not _pressed_keys.get(key_comb, False):
+        return
+    fire_combo(key_comb)
+
+def fire_combo(key_comb: tuple[str]):
+    func = _bound_keys.get(key_comb)
+    if func is not None and _run:
+        _run_these_funcs.append(func)
+
+
+def combo_is_held(key_comb: tuple[str], currently_held_keys: set[str]) -> bool:
+    """Whether all of a bound combination's keys are held, and none of its !keys."""
+    parts = _combo_keys.get(key_comb)
+    if parts is None:  # Only just bound, or about to be unbound.
+        parts = (get_inclusions(key_comb), get_exclusions(key_comb))
+
+    inclusions, exclusions = parts
+    return inclusions <= currently_held_keys and exclusions.isdisjoint(currently_held_keys)
+
+
+def tap_key(key_str: str):
+    """Presses and immediately releases a key that has no held state of its own, eg scroll_up."""
+    _currently_held_keys.add(key_str)
+    try_hotkey(_currently_held_keys)
+    _currently_held_keys.discard(key_str)
+    untry_hotkey(_currently_held_keys)
+
+
+def type_keys(keys: tuple, interval: float):
+    """Sends keys from translate_text, run through the queue by ctl.type_text()."""
+    # Recorded first, so the listener can tell these apart from the user's typing however late
+    # they reach it, and can't expand an abbreviation that an expansion itself types.
+    expiry = time.monotonic() + len(keys) * interval + SYNTHETIC_KEY_EXPIRY
+    _synthetic_keys.extend((pynput_to_snakebind(key), expiry) for key in keys)
+    send_keys(keys, interval)
+
 
+def is_synthetic(key_str: str) -> bool:
+    """Whether a pressed key is the next one ctl.type_text() sent, rather than the user typing."""
+    now = time.monotonic()
+    while _synthetic_keys and _synthetic_keys[0][1] < now:
+        _synthetic_keys.popleft()  # Never arrived, eg swallowed by the system.
 
-# These three functions are the pynput event listeners.
+    if _synthetic_keys and _synthetic_keys[0][0] == key_str:
+        _synthetic_keys.popleft()
+        return True
+    return False
+
+
+def check_abbreviation(key: keyboard.Key | keyboard.KeyCode, key_str: str):
+    """Feeds a pressed key into the abbreviation buffer, and expands any abbreviation it completes."""
+    char = " " if key_str == "space" else getattr(key, "char", None)
+
+    if char is None or _currently_held_keys & _shortcut_modifiers:
+        # Arrows, enter, ctrl+something etc could all move the cursor away, so start again.
+        if key_str not in ("shift", "shift_r", "caps_lock"):
+            _abbreviations.clear()
+        return
+
+    found = _abbreviations.feed(char)
+    if found is None:
+        return
+
+    abbreviation, expansion = found
+    erase = "\b" * len(abbreviation)  # Backspaces over the abbreviation.
+    if callable(expansion):
+        ctl.type_text(erase)
+        _run_these_funcs.append(expansion)
+    else:
+        ctl.type_text(erase + expansion)
+
+
+# These five functions are the pynput event listeners.
 def on_click(x: int, y: int, button: mouse.Button, pressed: bool):
     """This function runs code every time the user clicks.
 
@@ -180,6 +472,9 @@ def on_click(x: int, y: int, button: mouse.Button, pressed: bool):
     global _currently_held_keys
 
     key_str = pynput_to_snakebind(button)
+    if (key_str in _currently_held_keys) != pressed:
+        _motion.clear()  # A gesture is only made while the same set of keys is held.
+    _abbreviations.clear()  # Clicking probably moved the cursor.
     if pressed:
         if button not in _currently_held_keys:
             _currently_held_keys |= {key_str}
@@ -198,16 +493,51 @@ def on_click(x: int, y: int, button: mouse.Button, pressed: bool):
         
         untry_hotkey(_currently_held_keys)
 
-def on_press(key: keyboard.Key):
+def on_scroll(x: int, y: int, dx: int, dy: int):
+    """This function runs code every time the user scrolls, as taps of the scroll_ keys.
+
+    Arguments:
+        x: The x position of received scroll event.
+        y: The y position of received scroll event.
+        dx: Horizontal scroll amount, positive is right.
+        dy: Vertical scroll amount, positive is up.
+    """
+    if dy:
+        tap_key("scroll_up" if dy > 0 else "scroll_down")
+    if dx:
+        tap_key("scroll_right" if dx > 0 else "scroll_left")
+
+def on_move(x: int, y: int):
+    """This function runs code every time the mouse moves, taps gesture_ keys when it swipes.
+
+    Arguments:
+        x: The x position of the mouse.
+        y: The y position of the mouse.
+    """
+    # This fires constantly, so bail out as cheaply as possible. Gestures need something held.
+    if not _gesture_bindings or not _currently_held_keys or not _run:
+        return
+
+    _motion.push(x, y, time.monotonic(), ctl.MOUSE_MOVE_INTERVAL)
+    direction = detect_swipe(_motion, ctl.GESTURE_DISTANCE, ctl.GESTURE_STRAIGHTNESS)
+    if direction is not None:
+        _motion.clear()  # One swipe, one gesture.
+        tap_key("gesture_" + direction)
+
+def on_press(key: keyboard.Key, injected: bool = False):
     """This function runs code every time the user pushes a key down on the keyboard.
 
     Arguments:
         key: The type of key pressed.
+        injected: True if the key was sent by a program rather than typed, only passed by newer
+            versions of pynput.
 
     """
     global _currently_held_keys
     
     key_str = pynput_to_snakebind(key)
+    if key_str not in _currently_held_keys:
+        _motion.clear()  # Only on a real change, held keys auto-repeat and that mustn't stop gestures.
     if _run:
         if key not in _currently_held_keys:
             _currently_held_keys |= {key_str}
@@ -217,16 +547,24 @@ def on_press(key: keyboard.Key):
 
     try_hotkey(_currently_held_keys)
 
-def on_release(key: keyboard.Key):
+    # is_synthetic() goes first, it has to see every key to keep its place.
+    if not is_synthetic(key_str) and not injected and _abbreviations and _run:
+        check_abbreviation(key, key_str)
+
+def on_release(key: keyboard.Key, injected: bool = False):
     """This function runs code every time the user lifts a key on the keyboard.
 
     Arguments:
         key: The type of key released.
+        injected: True if the key was sent by a program rather than typed, only passed by newer
+            versions of pynput.
 
     """
     global _currently_held_keys
     
     key_str = pynput_to_snakebind(key)
+    if key_str in _currently_held_keys:
+        _motion.clear()
     if _run:
         try:
             _currently_held_keys -= {key_str}
@@ -247,6 +585,9 @@ def process_macro_string(macro_str: str) -> tuple[str]:
 
     Returns:
         A tuple of strings, each string is a SnakeBinds key.
+
+    Raises:
+        ValueError: If the string is empty, has an empty key (eg "ctrl++a") or an invalid key.
     """
     macro_str = macro_str.replace(" ", "")  # Remove spaces.
     macro_str = macro_str.replace("\n", "")  # Remove newlines.
@@ -258,11 +599,24 @@ def process_macro_string(macro_str: str) -> tuple[str]:
 
     # If there is no docstring, then it shouldn't try to be a macro.
     if macro_str == "":
-        raise ValueError(f"{repr(keyname)} (macro_str) is not a valid pynput identifier or snakebinds alias.")
+        raise ValueError("Empty macro string, it needs at least one key.")
 
     macro_keys = macro_str.split("+")
 
+    # The last key can say when to trigger, eg "caps_lock:tap". Just ":" is the colon key though,
+    # including in "!:" (colon not held).
+    trigger = "press"
+    last_key = macro_keys[-1].removeprefix("!")
+    if len(last_key) > 1 and ":" in last_key[1:]:
+        macro_keys[-1], _, trigger = macro_keys[-1].rpartition(":")
+        trigger = trigger.lower()
+        if trigger not in TRIGGERS:
+            raise ValueError(f"{repr(trigger)} (macro_str) is not a trigger, use one of {TRIGGERS}.")
+
     for keyname in macro_keys:
+        if keyname == "":
+            raise ValueError(f"{repr(macro_str)} (macro_str) has an empty key, eg from a doubled \"+\".")
+
         # Remove the exclamation mark temporarily while it asseses whether the key is valid.
         if keyname[0] == "!":
             prefix = "!"
@@ -277,22 +631,31 @@ def process_macro_string(macro_str: str) -> tuple[str]:
 
         keyname_list.append(prefix + key_lookup)
 
+    if trigger != "press":
+        keyname_list.append(":" + trigger)
+
     keyname_tuple = tuple(keyname_list)  # Use a tuple so it's hashable for a dictionary.
     
     return keyname_tuple
 
 
-def bind_this_function(new_func: Callable):
+def bind_this_function(new_func: Callable, timeout: float | None = None, policy: str | None = None):
     """Takes a function and binds the key combination to running said function.
 
     Arguments:
         new_func:
             The function to be added to the list of macros.
             It must have a docstring, which is used to create the macro.
+        timeout: Same as bind's.
+        policy: Same as bind's.
     
+    Returns:
+        The key combination it was bound to.
+
     Raises:
         NameError: If the key combination is already bound.
-        ValueError: If the function has no docstring or the docstring is not a valid macro string.
+        ValueError: If the function has no docstring, the docstring is not a valid macro string or
+            policy isn't one of MATCH_POLICIES.
     """
     macro_str: str = new_func.__doc__
 
@@ -304,8 +667,154 @@ def bind_this_function(new_func: Callable):
 
     if key_comb in _bound_keys:
         raise NameError(f"{new_func.__doc__} already defines a macro.")
-    _bound_keys[key_comb] = new_func  # new_func will now run when the key combination is pressed.
-    _pressed_keys[key_comb] = False  # Initialize the pressed keys to false.
+    add_binding(key_comb, new_func, timeout, policy)  # new_func will now run when the key combination is pressed.
+
+    return key_comb
+
+
+def uses_gesture(key_comb: tuple[str]) -> bool:
+    """Whether a key combination needs mouse movement to be tracked."""
+    return any(key_name.lstrip("!").startswith("gesture_") for key_name in key_comb)
+
+
+# Bindings are changed in place, so changing a few of them costs the same however many there are.
+# The listener threads only ever iterate over snapshots (tuple(...) of a dict is atomic in CPython),
+# and a combination only starts matching once it's in _bound_keys, which is updated last when adding
+# and first when removing, so a whole batch appears (or disappears) to the listeners at once.
+def add_bindings(bindings: dict[tuple[str], Callable], timeout: float | None = None, policy: str | None = None):
+    """Binds already processed key combinations to functions, safe to use while listening.
+
+    Arguments:
+        bindings: Key combinations, as returned by process_macro_string, to the functions to run
+            when they are pressed.
+        timeout: Same as bind's, for every function in bindings.
+        policy: Same as bind's, for every combination in bindings.
+
+    Raises:
+        ValueError: If policy isn't one of MATCH_POLICIES.
+        NameError: If any of the combinations are already bound, in which case none are bound.
+    """
+    global _gesture_bindings
+
+    if policy is not None and policy not in MATCH_POLICIES:
+        raise ValueError(f"{policy!r} is not a match policy, use one of {MATCH_POLICIES}.")
+
+    with _bindings_lock:
+        # Checked under the lock, so two threads binding the same combination can't both succeed.
+        already_bound = [key_comb for key_comb in bindings if key_comb in _bound_keys]
+        if already_bound:
+            raise NameError(f"{', '.join(map(repr, map('+'.join, already_bound)))} already define macros, "
+                            "nothing was bound.")
+
+        for key_comb in bindings:
+            if uses_gesture(key_comb):
+                _gesture_bindings += 1
+            if get_trigger(key_comb) != "press":
+                _combo_triggers[key_comb] = get_trigger(key_comb)
+            if policy is not None:
+                _combo_policies[key_comb] = policy
+
+            inclusions = frozenset(get_inclusions(key_comb))
+            _combo_keys[key_comb] = (inclusions, frozenset(get_exclusions(key_comb)))
+            _pressed_keys[key_comb] = False  # Initialize the pressed keys to false.
+            link_subsumption(key_comb, inclusions)
+
+        if timeout is not None:
+            for func in bindings.values():
+                _macro_timeouts[func] = timeout
+
+        _bound_keys.update(bindings)
+
+def add_binding(key_comb: tuple[str], func: Callable, timeout: float | None = None, policy: str | None = None):
+    """Binds one already processed key combination to a function, see add_bindings."""
+    add_bindings({key_comb: func}, timeout, policy)
+
+def remove_bindings(key_combs: tuple[tuple[str]]) -> dict[tuple[str], Callable]:
+    """Removes key combinations' bindings, safe to use while listening.
+
+    Arguments:
+        key_combs: Tuples of SnakeBinds keys, as returned by process_macro_string.
+
+    Returns:
+        The combinations that were bound, and the functions they were bound to.
+    """
+    global _gesture_bindings
+
+    with _bindings_lock:
+        removed = {key_comb: _bound_keys.pop(key_comb) for key_comb in key_combs if key_comb in _bound_keys}
+
+        for key_comb in removed:
+            if uses_gesture(key_comb):
+                _gesture_bindings -= 1
+
+            inclusions, _ = _combo_keys.pop(key_comb)
+            unlink_subsumption(key_comb, inclusions)
+            _pressed_keys.pop(key_comb, None)
+            _combo_policies.pop(key_comb, None)
+            _combo_triggers.pop(key_comb, None)
+            _press_times.pop(key_comb, None)
+            _press_generations.pop(key_comb, None)
+            _suppressed.discard(key_comb)
+
+        # Timeouts belong to functions, which can be bound to more than one combination.
+        if any(func in _macro_timeouts for func in removed.values()):
+            still_bound = set(_bound_keys.values())
+            for func in removed.values():
+                if func not in still_bound:
+                    _macro_timeouts.pop(func, None)
+
+    return removed
+
+def remove_binding(key_comb: tuple[str]) -> Callable | None:
+    """Removes one key combination's binding, see remove_bindings.
+
+    Returns:
+        The function that was bound, or None if the combination wasn't bound.
+    """
+    return remove_bindings((key_comb,)).get(key_comb)
+
+
+# The subsumption graph (_supersets) is kept up to date using two indexes, so adding a combination
+# only looks at combinations sharing its keys rather than every binding.
+def link_subsumption(key_comb: tuple[str], inclusions: frozenset[str]):
+    """Adds a combination to the subsumption graph and its indexes."""
+    if inclusions:
+        # Supersets have every one of this combination's keys, so start from the rarest key.
+        candidates = min((_combos_by_key.get(key_name, set()) for key_name in inclusions), key=len)
+        supersets = {other for other in candidates
+                     if _combo_keys[other][0] > inclusions and get_trigger(other) in OVERRIDING_TRIGGERS}
+    else:
+        supersets = {other for other, (other_inclusions, _) in _combo_keys.items()
+                     if other_inclusions and get_trigger(other) in OVERRIDING_TRIGGERS}
+    _supersets[key_comb] = supersets
+
+    # This combination is a superset of everything bound to a strict subset of its keys. Combinations
+    # are only a few keys long, so it's quick to go through the subsets.
+    if get_trigger(key_comb) in OVERRIDING_TRIGGERS:
+        for size in range(len(inclusions)):
+            for subset in combinations(inclusions, size):
+                for other in _combos_by_inclusions.get(frozenset(subset), ()):
+                    _supersets[other].add(key_comb)
+
+    _combos_by_inclusions.setdefault(inclusions, set()).add(key_comb)
+    for key_name in inclusions:
+        _combos_by_key.setdefault(key_name, set()).add(key_comb)
+
+def unlink_subsumption(key_comb: tuple[str], inclusions: frozenset[str]):
+    """Removes a combination from the subsumption graph and its indexes."""
+    _combos_by_inclusions[inclusions].discard(key_comb)
+    if not _combos_by_inclusions[inclusions]:
+        del _combos_by_inclusions[inclusions]
+    for key_name in inclusions:
+        _combos_by_key[key_name].discard(key_comb)
+        if not _combos_by_key[key_name]:
+            del _combos_by_key[key_name]
+
+    del _supersets[key_comb]
+    for size in range(len(inclusions)):
+        for subset in combinations(inclusions, size):
+            for other in _combos_by_inclusions.get(frozenset(subset), ()):
+                _supersets[other].discard(key_comb)
 
 
 def unbind():
@@ -314,63 +823,171 @@ def unbind():
     global _queued_partials
 
     if ctl.EMPTY_QUEUE_AFTER_UNBIND:
-        _queued_partials = []
+        _queued_partials = deque()
 
     _run = False
+    _loops_stopping.set()
+
+    # Cancel every macro, including the one calling unbind(), they all get wound down when the
+    # event loop exits.
+    for macro_thread in _macro_threads:
+        macro_thread.cancel()
 
 def rebind():
     """Run this to start/restart checking for macro combinations being pressed."""
+    for loop_thread in start_loops():
+        loop_thread.join()  # You can't accidentally try to run rebind() in your code and screw things over because this bit hangs until loose ends are tied up.
+
+def start_loops() -> tuple[threading.Thread, threading.Thread]:
+    """Starts checking for macro combinations being pressed, without waiting for it to stop.
+
+    Returns:
+        The threads running macros and queued calls, both finish after unbind() is called.
+    """
     global _run
-    _run = True
-
-    def event_loop():
-        global _macro_threads
-        while _run:
-            # If MACRO_CYCLE_DELAY is 0, this is just a busy wait while _queued_partials or
-            # _run_these_funcs are empty.
-            time.sleep(ctl.MACRO_CYCLE_DELAY)
-
-            # Every cycle, go through and run all relevant macros requested at that moment in time.
-            while _run_these_funcs:
-                cur_func = _run_these_funcs.pop(0)  # Take the functions off the list and queue them to run.
-                _macro_threads.append(MacroThread(cur_func))
-                _macro_threads[-1].start()
-
-                # Joins and makes killable all macro threads that have finished executing.
-                map(stop_if_finished, _macro_threads)
-                
-                _macro_threads = list(filter(is_not_killable, _macro_threads))  # Remove finished threads.
-            
-            # Similarly, run all queued functions.
-            while _queued_partials:
-                cur_func = _queued_partials.pop(0)
-                cur_func()
+    global _loop_threads
+    global _loops_stopping
+
+    with _start_lock:
+        # The old loops get told to stop, even if unbind() already has, and are waited for. Otherwise
+        # two output loops could take turns popping the same queue, and the old event loop would
+        # cancel the new one's macros on its way out.
+        _loops_stopping.set()
+        for loop_thread in _loop_threads:
+            if loop_thread is not threading.current_thread():
+                loop_thread.join()
+
+        # Each pair of loops has its own event, so an unbind() and a quick rebind() can't leave the
+        # old loops running because they never saw _run go False.
+        stopping = _loops_stopping = threading.Event()
+        _run = True
+
+        # Starting macros and running queued output happen in separate threads, so a slow queued call
+        # (eg a screenshot, or a long pyautogui.write) can't delay newly triggered macros.
+        def event_loop():
+            global _macro_threads
+            _dispatcher_running.set()
+            while not stopping.is_set():
+                # If MACRO_CYCLE_DELAY is 0, this is just a busy wait while _run_these_funcs is empty.
+                time.sleep(ctl.MACRO_CYCLE_DELAY)
+
+                # Every cycle, go through and run all relevant macros requested at that moment in time.
+                while _run_these_funcs and not stopping.is_set():
+                    cur_func = _run_these_funcs.pop(0)  # Take the functions off the list and queue them to run.
+                    _macro_threads.append(MacroThread(cur_func, timeout=_macro_timeouts.get(cur_func)))
+                    _macro_threads[-1].start()
+
+                supervise_macros()
+
+            _dispatcher_running.clear()
+
+            # Don't leave zombie macros behind once unbind() has been called.
+            cancel_all_macros()
+
+        def output_loop():
+            while not stopping.is_set():
+                time.sleep(ctl.MACRO_CYCLE_DELAY)
+
+                # Queued functions all run here, one after another, so they keep the order they were
+                # queued in and never run at the same time as each other.
+                while _queued_partials and not stopping.is_set():
+                    cur_func = _queued_partials.popleft()
+                    try:
+                        cur_func()
+                    except Exception:
+                        traceback.print_exc()  # Don't let one bad call stop all later output.
     
-    event_thread = threading.Thread(target=event_loop)
-    event_thread.start()
-    event_thread.join()  # You can't accidentally try to run rebind() in your code and screw things over because this bit hangs until loose ends are tied up.
+        event_thread = threading.Thread(target=event_loop)
+        output_thread = threading.Thread(target=output_loop)
+        event_thread.start()
+        output_thread.start()
 
-# Called when the program is first started, run by bind class __init__ to reduce namespace clutter.
-def _bind():
-    """Initialise listeners then start checking for macro combinations being pressed."""
-    global _run
-    global _bound_keys
-    global _run_these_funcs
+        _loop_threads = (event_thread, output_thread)
+        return _loop_threads
+
+def start_listeners():
+    """Starts the keyboard and mouse listeners, if they aren't already running."""
     global _mouse_listener
     global _keyboard_listener
-    
-    _run = True
 
-    if _mouse_listener is not None:
-        _mouse_listener = mouse.Listener(on_click=on_click)
-        _mouse_listener.start()
+    with _start_lock:
+        if _mouse_listener is None:
+            _mouse_listener = mouse.Listener(on_click=on_click, on_scroll=on_scroll, on_move=on_move)
+            _mouse_listener.start()
 
-        _keyboard_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
-        _keyboard_listener.start()
+            _keyboard_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
+            _keyboard_listener.start()
+
+def stop_listeners():
+    """Stops the keyboard and mouse listeners, bind() or ctl.start() starts new ones."""
+    global _mouse_listener
+    global _keyboard_listener
+
+    with _start_lock:
+        if _mouse_listener is not None:
+            _mouse_listener.stop()
+            _keyboard_listener.stop()
+            _mouse_listener = None
+            _keyboard_listener = None
+
+# Called when the program is first started, run by bind class __init__ to reduce namespace clutter.
+def _bind():
+    """Initialise listeners then start checking for macro combinations being pressed."""
+    start_listeners()
 
     # Start checking for macro combinations in here.
     rebind()
 
+
+class BindHandle:
+    """Returned by ctl.start(), lets a program that has better things to do with its main thread
+    know when SnakeBinds is up and running, and stop it again."""
+    def __init__(self):
+        self.ready = threading.Event()  # Set once the listeners and macro running are going.
+        self.startup_latency: float | None = None  # Seconds from ctl.start() to ready being set.
+        self._threads: tuple[threading.Thread] = ()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Blocks until SnakeBinds is ready.
+
+        Returns:
+            True if it's ready, False if the timeout ran out first.
+        """
+        return self.ready.wait(timeout)
+
+    def is_running(self) -> bool:
+        """Whether the macro running threads are still going."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Waits until unbind() (or stop()) has been called and everything has finished.
+
+        Returns:
+            True if it finished, False if the timeout ran out first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        return not self.is_running()
+
+    def stop(self, timeout: float | None = None, close_listeners: bool = False) -> bool:
+        """Same as unbind(), but also waits for everything to finish.
+
+        Arguments:
+            timeout: Maximum seconds to wait, None to wait as long as it takes.
+            close_listeners: Also stop the keyboard and mouse listeners, eg when the host program
+                is closing down.
+
+        Returns:
+            True if it finished, False if the timeout ran out first.
+        """
+        unbind()
+        finished = self.join(timeout)
+        if close_listeners:
+            stop_listeners()
+        return finished
+
+
 class ctl:
     """Extra functions that help above the simple start/stop (eg bind, unbind, rebind) commands
     available in the module's global namespace."""
@@ -378,6 +995,14 @@ class ctl:
     DEBUG_SHOW_KEYS = False  # If true, prints keypress events to the console.
     MACRO_CYCLE_DELAY = 0.002  # How often to test for macro combinations being requested.
     EMPTY_QUEUE_AFTER_UNBIND = True  # If true, unbind() cancels any queued calls (eg pyautogui).
+    MACRO_CANCEL_GRACE = 1.0  # Seconds a cancelled macro gets to finish before it is reported as stuck.
+    MOUSE_MOVE_INTERVAL = 0.01  # Mouse movements closer together than this are merged for gestures.
+    GESTURE_DISTANCE = 150  # How many pixels the mouse has to travel for a gesture.
+    GESTURE_STRAIGHTNESS = 0.8  # How straight a gesture has to be, 1 being perfectly straight.
+    TYPE_INTERVAL = 0  # Seconds between keys sent by ctl.type_text(), some programs drop keys at 0.
+    HOLD_TIME = 0.2  # Seconds a key has to be held for ":hold", anything shorter is a ":tap".
+    DOUBLE_TAP_TIME = 0.3  # Maximum seconds between the two presses of a ":double".
+    MATCH_POLICY = "all"  # "all" runs every held combination, "most_specific" only the ones with the most keys.
 
     BE_NICE_TO_WINDOWS_PYAUTOGUI = True
     THREAD_UNSAFE_OPTIMISATION = False
@@ -393,13 +1018,190 @@ class ctl:
                 Runs a function at the earliest possible opportunity. This function should not have
                 significant delays coded into it.
         """
-        _queued_partials.append(non_blocking_func)
+        macro_thread = get_current_macro()
+        if macro_thread is None:
+            _queued_partials.append(non_blocking_func)
+            return
+
+        if macro_thread.cancelled:
+            return  # A cancelled macro shouldn't keep producing output.
+
+        def run_unless_cancelled():
+            # Output that was queued before the macro got cancelled is dropped too.
+            if not macro_thread.cancelled:
+                non_blocking_func()
+
+        _queued_partials.append(run_unless_cancelled)
 
     def print(*args, **kwargs):
         """Queued print function, it prints out in the same order it was called, but also taking
         into account other queued macro calls."""
         # Basically run this as a normal print and it will add the appriopriate asynchronisation.
-        _queued_partials.append(lambda: print(*args, **kwargs))
+        ctl.queue(lambda: print(*args, **kwargs))
+
+    def start(background: bool = True) -> BindHandle:
+        """Starts the listeners and macro running, like bind(), but without taking over the
+        calling thread.
+
+        Arguments:
+            background: If False, this blocks until unbind() like bind() does, and returns the
+                (finished) handle afterwards.
+
+        Returns:
+            A BindHandle, its ready event is set once the listeners are receiving events and macros
+            can be run, and its startup_latency says how long that took.
+
+        Raises:
+            RuntimeError: If SnakeBinds is already running.
+        """
+        with _start_lock:
+            # start_loops() sets _run before letting go of the lock, so a second ctl.start() can't
+            # slip in before the first one's threads get going.
+            if _run:
+                raise RuntimeError("SnakeBinds is already running, call unbind() first.")
+
+            handle = BindHandle()
+            started_at = time.perf_counter()
+            start_listeners()
+            # Kept here, stop(close_listeners=True) can set the globals back to None at any point.
+            mouse_listener = _mouse_listener
+            keyboard_listener = _keyboard_listener
+            handle._threads = start_loops()
+
+        def wait_until_ready():
+            # pynput's wait() returns once the listener is actually receiving events.
+            mouse_listener.wait()
+            keyboard_listener.wait()
+            _dispatcher_running.wait()
+            handle.startup_latency = time.perf_counter() - started_at
+            handle.ready.set()
+
+        threading.Thread(target=wait_until_ready, daemon=True).start()
+
+        if not background:
+            handle.join()
+        return handle
+
+    def bind_many(mapping: dict[str, Callable], timeout: float | None = None,
+                  policy: str | None = None) -> tuple[tuple[str]]:
+        """Binds lots of macro strings to functions in one go, eg from a per-app shortcut map. The
+        macro strings are used instead of the functions' docstrings.
+
+        Every macro string is checked before anything is bound, so either all of them get bound or
+        (if anything raises) none do. They can be bound while macros are running.
+
+        Arguments:
+            mapping: Macro strings (same form as the docstrings) to the functions they run.
+            timeout: Same as bind's, for every function in mapping. Bindings that need different
+                timeouts or policies can go in separate bind_many calls.
+            policy: Same as bind's, for every macro string in mapping.
+
+        Returns:
+            The key combinations bound, in the same order as mapping.
+
+        Raises:
+            ValueError: If any macro string isn't valid, listing all the invalid ones, or policy
+                isn't one of MATCH_POLICIES.
+            NameError: If any macro string is already bound, or two of them are the same combination,
+                listing all of them.
+        """
+        bindings: dict[tuple[str], Callable] = {}
+        invalid: list[str] = []
+        duplicates: list[str] = []
+
+        for macro_str, func in mapping.items():
+            try:
+                key_comb = process_macro_string(macro_str)
+            except ValueError as error:
+                invalid.append(f"{macro_str!r}: {error}")
+                continue
+
+            if key_comb in bindings:
+                duplicates.append(repr(macro_str))
+            bindings[key_comb] = func
+
+        if invalid:
+            raise ValueError("Invalid macro strings, nothing was bound.\n" + "\n".join(invalid))
+        if duplicates:
+            raise NameError(f"{', '.join(duplicates)} repeat combinations earlier in mapping, nothing was bound.")
+
+        add_bindings(bindings, timeout, policy)  # Raises NameError for anything already bound.
+        return tuple(bindings)
+
+    def unbind_combo(macro_str: str) -> Callable | None:
+        """Stops a key combination running its macro, the rest keep running.
+
+        Arguments:
+            macro_str: The macro string it was bound with (aliases and spacing don't matter).
+
+        Returns:
+            The function that was bound, or None if nothing was bound to it.
+
+        Raises:
+            ValueError: If the macro string isn't valid.
+        """
+        return remove_binding(process_macro_string(macro_str))
+
+    def type_text(text: str, interval: float | None = None):
+        """Types out a string, much faster than pyautogui.write() since it goes out as one queued
+        call rather than one per character.
+
+        Arguments:
+            text: The string to type, "\n" presses enter and "\b" backspace.
+            interval: Seconds to wait between keys, defaults to ctl.TYPE_INTERVAL.
+        """
+        if interval is None:
+            interval = ctl.TYPE_INTERVAL
+        ctl.queue(partial(type_keys, translate_text(text), interval))
+
+    def add_abbreviation(abbreviation: str, expansion: str | Callable):
+        """Expands an abbreviation as it's typed, eg ctl.add_abbreviation(";sig", "Best wishes, Jo").
+
+        Arguments:
+            abbreviation: The characters to watch out for.
+            expansion: The text that replaces the abbreviation, or a function to run as a macro
+                once the abbreviation is deleted.
+
+        Raises:
+            ValueError: If the abbreviation is empty.
+            NameError: If the abbreviation already exists.
+        """
+        _abbreviations.add(abbreviation, expansion)
+
+    def remove_abbreviation(abbreviation: str):
+        """Stops expanding an abbreviation."""
+        _abbreviations.remove(abbreviation)
+
+    def sleep(seconds: float) -> bool:
+        """Use instead of time.sleep() inside macros, it wakes up early if the macro is cancelled
+        (by unbind() or its timeout).
+
+        Arguments:
+            seconds: How long to sleep for.
+
+        Returns:
+            True if it slept the whole time, False if the macro was cancelled.
+        """
+        macro_thread = get_current_macro()
+        if macro_thread is None:
+            time.sleep(seconds)
+            return True
+
+        return not macro_thread.wait_cancelled(seconds)
+
+    def is_cancelled() -> bool:
+        """Returns True if the macro calling this has been asked to stop. Long running macros
+        should check this (or use ctl.is_held/ctl.sleep, which do) and return when it is True."""
+        macro_thread = get_current_macro()
+        return macro_thread is not None and macro_thread.cancelled
+
+    def get_stuck_macros() -> tuple[str]:
+        """Returns the names of macros that were cancelled but never finished running.
+
+        Returns:
+            A tuple of function names, one per stuck run.
+        """
+        return tuple(macro_thread.name for macro_thread in _stuck_macros if not macro_thread.finished)
     
     def import_pyautogui():
         """Use this instead of directly calling pyautogui functions, as this makes sure pyautogui
@@ -445,13 +1247,17 @@ class ctl:
                 A string of keys that are being held down.
         
         Returns:
-            True if the macro string is being held down, False otherwise.
+            True if the macro string is being held down, False otherwise. Always False once the
+            calling macro has been cancelled, so "while ctl.is_held(...)" loops stop by themselves.
         
         Raises:
             ValueError: If the string is not valid.
         """
         key_comb = process_macro_string(macro_str)
 
+        if ctl.is_cancelled():
+            return False
+
         return get_inclusions(key_comb) <= _currently_held_keys and \
                 not get_exclusions(key_comb) & _currently_held_keys
         
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+"""One thread that runs callbacks at given times, shared by every timed trigger (hold, tap etc).
+
+Pending deadlines sit in a heap, and the thread sleeps until the earliest one is due rather than
+polling, so hundreds of pending decisions cost nothing until they are due.
+"""
+from typing import Callable
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class DeadlineScheduler:
+    """Runs callbacks at deadlines (in time.monotonic() seconds) on a single background thread.
+
+    Callbacks run one at a time on that thread, so they should be quick, eg scheduling a macro.
+    """
+    def __init__(self):
+        self._heap: list[tuple[float, int, Callable]] = []
+        self._counter = itertools.count()  # Breaks ties, so callbacks are never compared.
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, deadline: float, callback: Callable):
+        """Runs callback once time.monotonic() reaches deadline. There's no cancelling, callbacks
+        that might go stale should check for themselves when they run."""
+        order = next(self._counter)
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, order, callback))
+            if self._thread is None:
+                # Started when first needed, so scripts without timed triggers don't get a thread.
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            elif self._heap[0][1] == order:
+                self._condition.notify()  # New earliest deadline, wake up earlier than planned.
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+
+                _, _, callback = heapq.heappop(self._heap)
+
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()  # One bad callback shouldn't stop every other deadline.
@@ -124,7 +124,17 @@ snakebind_keys = [
     "mouse_middle",
     "mouse_right",
     "mouse_forward",
-    "mouse_backward"
+    "mouse_backward",
+
+    # These are tapped (pressed then released at once), rather than held.
+    "scroll_up",
+    "scroll_down",
+    "scroll_left",
+    "scroll_right",
+    "gesture_up",
+    "gesture_down",
+    "gesture_left",
+    "gesture_right"
 ]
 
 # Alias -> snakebind keyname.
@@ -193,5 +203,14 @@ _alias_lookup_dict = {
     "mbutton8": "mouse_backward",
     "mouse_x1": "mouse_backward",
     "m_x1": "mouse_backward",
-    "mx1": "mouse_backward"
+    "mx1": "mouse_backward",
+
+    "wheel_up": "scroll_up",
+    "wheel_down": "scroll_down",
+    "wheel_left": "scroll_left",
+    "wheel_right": "scroll_right",
+    "swipe_up": "gesture_up",
+    "swipe_down": "gesture_down",
+    "swipe_left": "gesture_left",
+    "swipe_right": "gesture_right"
 }